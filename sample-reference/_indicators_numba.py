@@ -0,0 +1,246 @@
+"""
+Numba kernels for the hot indicators used by prompt_parser_executor.
+
+Each kernel works on float64 numpy arrays and mirrors the pandas_ta
+definition (RMA = adjusted EWM with alpha = 1/n, BBands with ddof=0), so the
+results line up with ta.rsi / ta.atr / ta.adx / ta.bbands.
+Kernels are compiled with nogil=True so per-symbol work can run on threads.
+Falls back to plain Python when numba is not installed.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional – same code, just interpreted
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+    prange = range
+
+
+# ---------- smoothing ----------
+@njit(cache=True, nogil=True)
+def _rma_nb(x, n):
+    """pandas `x.ewm(alpha=1/n, min_periods=n).mean()` (adjust=True, ignore_na=False)."""
+    out = np.empty(x.shape[0])
+    if x.shape[0] == 0:
+        return out
+    alpha = 1.0 / n
+    old_wt_factor = 1.0 - alpha
+    weighted = x[0]
+    nobs = 0 if np.isnan(weighted) else 1
+    out[0] = weighted if nobs >= n else np.nan
+    old_wt = 1.0
+    for i in range(1, x.shape[0]):
+        cur = x[i]
+        is_obs = not np.isnan(cur)
+        if is_obs:
+            nobs += 1
+        if not np.isnan(weighted):
+            old_wt *= old_wt_factor
+            if is_obs:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + cur) / (old_wt + 1.0)
+                old_wt += 1.0
+        elif is_obs:
+            weighted = cur
+        out[i] = weighted if nobs >= n else np.nan
+    return out
+
+
+# ---------- indicators ----------
+@njit(cache=True, nogil=True)
+def rsi_nb(close, n):
+    """Relative Strength Index, same as ta.rsi(close, length=n)."""
+    size = close.shape[0]
+    gain = np.empty(size)
+    loss = np.empty(size)
+    if size:
+        gain[0] = np.nan
+        loss[0] = np.nan
+    for i in range(1, size):
+        diff = close[i] - close[i - 1]
+        gain[i] = diff if diff > 0 else 0.0
+        loss[i] = -diff if diff < 0 else 0.0
+    avg_gain = _rma_nb(gain, n)
+    avg_loss = _rma_nb(loss, n)
+    return 100.0 * avg_gain / (avg_gain + avg_loss)
+
+
+@njit(cache=True, nogil=True)
+def _true_range_nb(high, low, close):
+    size = close.shape[0]
+    tr = np.empty(size)
+    if size:
+        tr[0] = np.nan
+    for i in range(1, size):
+        hl = high[i] - low[i]
+        hc = abs(high[i] - close[i - 1])
+        lc = abs(low[i] - close[i - 1])
+        tr[i] = max(hl, hc, lc)
+    return tr
+
+
+@njit(cache=True, nogil=True)
+def atr_nb(high, low, close, n):
+    """Average True Range (RMA of true range), same as ta.atr(..., length=n)."""
+    return _rma_nb(_true_range_nb(high, low, close), n)
+
+
+@njit(cache=True, nogil=True)
+def adx_nb(high, low, close, n):
+    """Return (adx, dmp, dmn), same as ta.adx(..., length=n)."""
+    size = close.shape[0]
+    pos = np.empty(size)
+    neg = np.empty(size)
+    if size:
+        pos[0] = np.nan
+        neg[0] = np.nan
+    for i in range(1, size):
+        up = high[i] - high[i - 1]
+        dn = low[i - 1] - low[i]
+        pos[i] = up if (up > dn and up > 0) else 0.0
+        neg[i] = dn if (dn > up and dn > 0) else 0.0
+    k = 100.0 / atr_nb(high, low, close, n)
+    dmp = k * _rma_nb(pos, n)
+    dmn = k * _rma_nb(neg, n)
+    dx = 100.0 * np.abs(dmp - dmn) / (dmp + dmn)
+    return _rma_nb(dx, n), dmp, dmn
+
+
+@njit(cache=True, nogil=True)
+def bbands_nb(close, n, k):
+    """Return (lower, mid, upper, bandwidth), same as ta.bbands(close, length=n, std=k)."""
+    size = close.shape[0]
+    lower = np.full(size, np.nan)
+    mid = np.full(size, np.nan)
+    upper = np.full(size, np.nan)
+    width = np.full(size, np.nan)
+    for i in range(n - 1, size):
+        window = close[i - n + 1:i + 1]
+        mean = window.mean()
+        std = np.sqrt(((window - mean) ** 2).mean())
+        mid[i] = mean
+        lower[i] = mean - k * std
+        upper[i] = mean + k * std
+        width[i] = 100.0 * (upper[i] - lower[i]) / mean
+    return lower, mid, upper, width
+
+
+# ---------- rolling extremes ----------
+@njit(cache=True, nogil=True)
+def _rolling_extreme_nb(x, w, is_max):
+    """
+    Single-pass rolling max/min with a monotonic deque of indices (Lemire).
+    NaN wherever the window is incomplete or holds a NaN, like pandas rolling.
+    """
+    size = x.shape[0]
+    out = np.full(size, np.nan)
+    dq = np.empty(size, dtype=np.int64)
+    head = 0
+    tail = 0
+    last_nan = -1
+    for i in range(size):
+        v = x[i]
+        if np.isnan(v):
+            last_nan = i
+        else:
+            while tail > head and (x[dq[tail - 1]] <= v if is_max else x[dq[tail - 1]] >= v):
+                tail -= 1
+            dq[tail] = i
+            tail += 1
+        while tail > head and dq[head] <= i - w:
+            head += 1
+        if i >= w - 1 and last_nan <= i - w:
+            out[i] = x[dq[head]]
+    return out
+
+
+def _rolling_view(x, w, reduce):
+    """Rolling `reduce` as one C-level pass over a zero-copy sliding_window_view."""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= w:
+        out[w - 1:] = reduce(np.lib.stride_tricks.sliding_window_view(x, w), axis=1)
+    return out
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, nogil=True)
+    def rolling_max_nb(x, w):
+        """Same as pd.Series(x).rolling(w).max()."""
+        return _rolling_extreme_nb(x, w, True)
+
+    @njit(cache=True, nogil=True)
+    def rolling_min_nb(x, w):
+        """Same as pd.Series(x).rolling(w).min()."""
+        return _rolling_extreme_nb(x, w, False)
+else:
+    # an interpreted deque loop is slower than numpy's strided reduction
+    def rolling_max_nb(x, w):
+        """Same as pd.Series(x).rolling(w).max()."""
+        return _rolling_view(x, w, np.max)
+
+    def rolling_min_nb(x, w):
+        """Same as pd.Series(x).rolling(w).min()."""
+        return _rolling_view(x, w, np.min)
+
+
+# ---------- grouped (multi-symbol) ----------
+@njit(cache=True, nogil=True, parallel=True)
+def rsi_grouped_nb(close, codes, n):
+    """
+    RSI per symbol in one call.  `codes` are integer symbol ids
+    (pd.factorize) and each symbol's rows must be contiguous; smoothing
+    state restarts whenever the code changes.  Symbols run in parallel.
+    """
+    size = close.shape[0]
+    out = np.empty(size)
+    if size == 0:
+        return out
+    n_groups = 1
+    for i in range(1, size):
+        if codes[i] != codes[i - 1]:
+            n_groups += 1
+    starts = np.empty(n_groups + 1, dtype=np.int64)
+    starts[0] = 0
+    starts[n_groups] = size
+    g = 1
+    for i in range(1, size):
+        if codes[i] != codes[i - 1]:
+            starts[g] = i
+            g += 1
+    for g in prange(n_groups):
+        out[starts[g]:starts[g + 1]] = rsi_nb(close[starts[g]:starts[g + 1]], n)
+    return out
+
+
+# ---------- scalar (last value only) ----------
+@njit(cache=True, nogil=True)
+def rsi_last_nb(close, n):
+    """Final value of rsi_nb(close, n) without allocating the full series."""
+    old_wt_factor = 1.0 - 1.0 / n
+    avg_gain = 0.0
+    avg_loss = 0.0
+    old_wt = 1.0
+    nobs = 0
+    for i in range(1, close.shape[0]):
+        diff = close[i] - close[i - 1]
+        gain = diff if diff > 0 else 0.0
+        loss = -diff if diff < 0 else 0.0
+        if nobs == 0:
+            avg_gain = gain
+            avg_loss = loss
+        else:
+            old_wt *= old_wt_factor
+            avg_gain = (old_wt * avg_gain + gain) / (old_wt + 1.0)
+            avg_loss = (old_wt * avg_loss + loss) / (old_wt + 1.0)
+            old_wt += 1.0
+        nobs += 1
+    if nobs < n:
+        return np.nan
+    return 100.0 * avg_gain / (avg_gain + avg_loss)
@@ -1,16 +1,278 @@
 #!pip install pandas-ta
 #!pip install numpy==1.26.4
 
+import numpy as np
 import pandas as pd
 import pandas_ta as ta
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Callable, Dict, Any
 
-def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
+from _indicators_numba import (
+    adx_nb, atr_nb, bbands_nb, rolling_max_nb, rolling_min_nb, rsi_grouped_nb, rsi_last_nb, rsi_nb,
+)
+
+# Symbols needed before screen()'s per-symbol path fans out to a thread pool;
+# below this the pool start-up costs more than it saves.
+_PARALLEL_MIN_SYMBOLS = 64
+
+# Bars an RMA/EWM-smoothed indicator needs before its last value stops
+# depending on older history: (1 - 1/n) ** (10 * n) < 1e-4.
+_EWM_WARMUP = 10
+
+
+def _f64(s: pd.Series) -> np.ndarray:
+    return s.to_numpy(dtype=np.float64)
+
+
+class _Bars:
+    """
+    float64 arrays of a frame's close / high / low, each converted once on
+    first use.  The columns are float32, so every conversion is a copy;
+    _bars shares one instance per frame through the screen memo.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+
+    @cached_property
+    def close(self) -> np.ndarray:
+        return _f64(self._df["close"])
+
+    @cached_property
+    def high(self) -> np.ndarray:
+        return _f64(self._df["high"])
+
+    @cached_property
+    def low(self) -> np.ndarray:
+        return _f64(self._df["low"])
+
+
+def _memo(ctx, key: tuple, compute: Callable):
+    """
+    Reuse `ctx[key]` if this screen call already computed it (ctx=None → no
+    memo).  Callers put the bar count in `key`, since a symbol's full history
+    and its lookback tail can share one ctx.
+    """
+    if ctx is None:
+        return compute()
+    if key not in ctx:
+        ctx[key] = compute()
+    return ctx[key]
+
+
+def _bars(df: pd.DataFrame, ctx=None) -> _Bars:
+    """_Bars of `df`, memoised in `ctx` so a symbol's indicators convert its columns once."""
+    return _memo(ctx, ("bars", len(df)), lambda: _Bars(df))
+
+
+def tail_for(ind: str, win) -> int | None:
+    """
+    Minimum bars for `ind` so its last value matches a full-history run,
+    or None when the lookback isn't known (use the whole history).
+    """
+    win = win or 14
+    if ind in ("rsi", "atr", "kc_breakout"):
+        return win * _EWM_WARMUP
+    if ind == "adx_trend":  # Wilder smoothing applied twice (DM, then DX)
+        return 2 * win * _EWM_WARMUP
+    if ind in ("cci", "williams_r", "bb_width", "volume_sma", "bb_breakout"):
+        return win
+    if ind == "volume":
+        return 1
+    return None
+
+
+def _tail(df: pd.DataFrame, ind: str, win) -> pd.DataFrame:
+    n = tail_for(ind, win)
+    return df if n is None else df.iloc[-n:]
+
+
+def _no_rows(df: pd.DataFrame) -> pd.Series:
+    """All-False mask aligned to `df` (one memset, no Python bool list)."""
+    return pd.Series(np.zeros(len(df), dtype=bool), index=df.index)
+
+
+def _tail_extreme(arr: np.ndarray, w: int, fn: Callable) -> float:
+    """`fn` over the last `w` bars; NaN with less history, as rolling(w) would give."""
+    return float(fn(arr[-w:])) if len(arr) >= w else np.nan
+
+
+def _tail_pct(arr: np.ndarray, d: int) -> float:
+    """Last value of pct_change(d) without building the series."""
+    return float(arr[-1] / arr[-1 - d] - 1) if len(arr) > d else np.nan
+
+
+def _pct_change(arr: np.ndarray, d: int) -> np.ndarray:
+    """numpy pct_change(d): NaN for the first `d` bars."""
+    out = np.full(len(arr), np.nan)
+    if len(arr) > d:
+        out[d:] = arr[d:] / arr[:len(arr) - d] - 1
+    return out
+
+
+def _bbands(df: pd.DataFrame, win, ctx=None):
+    """(lower, mid, upper, bandwidth) arrays, memoised per call in `ctx`."""
+    return _memo(ctx, ("bbands", win, len(df)), lambda: bbands_nb(_bars(df, ctx).close, win or 5, 2.0))
+
+
+def _kc(df: pd.DataFrame, win, ctx=None) -> pd.DataFrame:
+    """ta.kc frame, memoised per call in `ctx`."""
+    return _memo(ctx, ("kc", win, len(df)), lambda: ta.kc(df["high"], df["low"], df["close"], length=win))
+
+
+def _atr(df: pd.DataFrame, win, ctx=None) -> np.ndarray:
+    """ATR array, memoised per call in `ctx`."""
+    bars = _bars(df, ctx)
+    return _memo(ctx, ("atr", win, len(df)), lambda: atr_nb(bars.high, bars.low, bars.close, win or 14))
+
+
+def _adx(df: pd.DataFrame, win, ctx=None):
+    """(adx, dmp, dmn) arrays, memoised per call in `ctx`."""
+    bars = _bars(df, ctx)
+    return _memo(ctx, ("adx", win, len(df)), lambda: adx_nb(bars.high, bars.low, bars.close, win or 14))
+
+
+def _stoch(df: pd.DataFrame, win, ctx=None) -> pd.DataFrame:
+    """ta.stoch frame, memoised per call in `ctx`."""
+    return _memo(ctx, ("stoch", win, len(df)), lambda: ta.stoch(df["high"], df["low"], df["close"], length=win))
+
+
+def _symbol_rsi(df: pd.DataFrame, win: int) -> pd.Series:
+    """RSI restarted per symbol, one kernel call for the whole frame."""
+    if "symbol" not in df:
+        return pd.Series(rsi_nb(_f64(df["close"]), win), index=df.index)
+    codes, _ = pd.factorize(df["symbol"].to_numpy())
+    order = np.argsort(codes, kind="stable")  # makes each symbol contiguous
+    out = np.empty(len(df))
+    out[order] = rsi_grouped_nb(_f64(df["close"])[order], codes[order], win)
+    return pd.Series(out, index=df.index)
+
+
+# ---------- indicator cache ----------
+class IndicatorCache:
+    """
+    Memoise full indicator arrays per symbol so repeated / chained filters
+    don't rerun pandas_ta on the same bars.
+    Keys are (symbol, last date, n_bars, indicator fn, window, params); a new
+    bar changes the key, so stale entries simply stop being hit.
+    Thread-safe, since screen() may evaluate symbols concurrently.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._store: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame_key(df: pd.DataFrame) -> tuple:
+        symbol = df["symbol"].iloc[-1] if "symbol" in df else id(df)
+        last = df["date"].iloc[-1] if "date" in df else None
+        return symbol, last, len(df)
+
+    def get_or_compute(self, df: pd.DataFrame, fn: Callable, bars: pd.DataFrame, win,
+                       ctx: dict = None, params: tuple = ()) -> np.ndarray:
+        """`fn(bars, win, ctx)` as a float64 array, cached under `df`'s identity."""
+        key = (*self._frame_key(df), fn, win, tuple(params))
+        with self._lock:
+            arr = self._store.get(key)
+            if arr is not None:
+                self._store.move_to_end(key)
+                return arr
+        arr = np.atleast_1d(np.asarray(fn(bars, win, ctx), dtype=np.float64))
+        with self._lock:
+            self._store[key] = arr
+            if len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+
+_INDICATOR_CACHE = IndicatorCache()
+
+
+# ---------- indicator registry ----------
+# fn(df, win, ctx) → full indicator Series.  Built once at import and shared
+# by apply_condition (whole frame) and apply_condition_group (last value).
+def _series(arr: np.ndarray, df: pd.DataFrame) -> pd.Series:
+    return pd.Series(arr, index=df.index)
+
+
+def _kc_width(df: pd.DataFrame, win, ctx=None) -> pd.Series:
+    kc = _kc(df, win, ctx)
+    return kc[f"KCBU_{win}_2_20"] - kc[f"KCBL_{win}_2_20"]
+
+
+# category 1 – indicator thresholds
+IND_FN = {
+    "rsi":            lambda df, win, ctx: _symbol_rsi(df, win or 14),
+    "stoch":          lambda df, win, ctx: _stoch(df, win, ctx)[f"STOCHk_{win}_3_3"],
+    "stochrsi":       lambda df, win, ctx: ta.stochrsi(df["close"], length=win)[f"STOCHRSIk_{win}_14_14_3_3"],
+    "cci":            lambda df, win, ctx: ta.cci(df["high"], df["low"], df["close"], length=win),
+    "williams_r":     lambda df, win, ctx: ta.willr(df["high"], df["low"], df["close"], length=win),
+    "awesome_osc":    lambda df, win, ctx: ta.ao(df["high"], df["low"]),
+    "kdj":            lambda df, win, ctx: ta.kdj(df["high"], df["low"], df["close"], length=win)[f"K_{win}_3"],
+    "ultimate_osc":   lambda df, win, ctx: ta.uo(df["high"], df["low"], df["close"]),
+    "chande_momentum":lambda df, win, ctx: ta.cmo(df["close"], length=win),
+    "roc":            lambda df, win, ctx: ta.roc(df["close"], length=win) / 100,
+    "money_flow_idx": lambda df, win, ctx: ta.mfi(df["high"], df["low"], df["close"], df["volume"], length=win),
+    "percentage_price_osc": lambda df, win, ctx: ta.ppo(df["close"])[f"PPO_{win}_26_12_9"],
+    "fisher_transform": lambda df, win, ctx: ta.fisher(df["high"], df["low"])[f"FISHERT_{win}_1"],
+    "tsi":            lambda df, win, ctx: ta.tsi(df["close"])[f"TSI_{win}_25_13_13"],
+    "schaff_trend_cycle": lambda df, win, ctx: ta.stc(df["close"]).iloc[:, 0],
+}
+
+# category 5 – volume / volatility
+VOL_FN = {
+    "volume":     lambda df, win, ctx: df["volume"],
+    "volume_sma": lambda df, win, ctx: df["volume"] / df["volume"].rolling(win).mean(),
+    "atr":        lambda df, win, ctx: _series(_atr(df, win, ctx), df) / df["close"],
+    "bb_width":   lambda df, win, ctx: _series(_bbands(df, win, ctx)[3], df),
+    "kc_width":   _kc_width,
+    "ui":         lambda df, win, ctx: ta.ui(df["close"], length=win),
+}
+
+# last-value shortcuts apply_condition_group prefers over the full series
+LAST_FN = {
+    "rsi": lambda df, win, ctx: rsi_last_nb(_bars(df, ctx).close, win or 14),
+}
+
+# category 4 – reference window (bars) per reference name
+_REF_WINDOWS = {"1d_low": 1, "1w_low": 5, "1m_low": 21, "52w_low": 252, "52w_high": 252}
+
+# category 6 – ta.cdl_pattern name per pattern_type
+_CDL_NAMES = {
+    "bullish_engulfing": "engulfing",
+    "bearish_engulfing": "engulfing",
+    "doji":        "doji",
+    "hammer":      "hammer",
+    "nr7":         "nr7",
+    "inside_bar":  "inside",
+    "outside_bar": "outside",
+}
+
+# category 10 – bars per timeframe ("ytd" depends on the frame length)
+_TIMEFRAME_DAYS = {"1d": 1, "1w": 5, "1m": 21, "3m": 63, "6m": 126, "1y": 252}
+
+
+def _timeframe_days(tf: str, n_bars: int) -> int:
+    return n_bars - 1 if tf == "ytd" else _TIMEFRAME_DAYS.get(tf, 21)
+
+
+def apply_condition(df: pd.DataFrame, cond: dict, ctx: dict = None) -> pd.Series:
     """
     Return a boolean Series indicating rows that satisfy `cond`.
     `cond` comes directly from parser JSON (one element inside `conditions`).
+    `ctx` is an optional memo a caller can pass to every condition it applies
+    to the same `df` (screen() itself goes through apply_condition_group).
     """
     category = cond["category"]
+    bars = _bars(df, ctx)
 
     # ---------- 1.  Indicator Threshold ----------
     if category == 1:
@@ -19,29 +281,7 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         op  = cond["op"]
         val = cond["value"]
 
-        # numeric indicators
-        series_map = {
-            #"rsi":            lambda: ta.rsi(df.close, length=win),
-            "rsi": lambda: df.groupby('symbol', group_keys=False).apply(
-                lambda g: ta.rsi(g['close'], length=win)
-            ),
-            "stoch":          lambda: ta.stoch(df.high, df.low, df.close, length=win)[f"STOCHk_{win}_3_3"],
-            "stochrsi":       lambda: ta.stochrsi(df.close, length=win)[f"STOCHRSIk_{win}_14_14_3_3"],
-            "cci":            lambda: ta.cci(df.high, df.low, df.close, length=win),
-            "williams_r":     lambda: ta.willr(df.high, df.low, df.close, length=win),
-            "awesome_osc":    lambda: ta.ao(df.high, df.low),
-            "kdj":            lambda: ta.kdj(df.high, df.low, df.close, length=win)[f"K_{win}_3"],
-            "ultimate_osc":   lambda: ta.uo(df.high, df.low, df.close),
-            "chande_momentum":lambda: ta.cmo(df.close, length=win),
-            "roc":            lambda: ta.roc(df.close, length=win) / 100,
-            "money_flow_idx": lambda: ta.mfi(df.high, df.low, df.close, df.volume, length=win),
-            "percentage_price_osc": lambda: ta.ppo(df.close)[f"PPO_{win}_26_12_9"],
-            "fisher_transform": lambda: ta.fisher(df.high, df.low)[f"FISHERT_{win}_1"],
-            "tsi":            lambda: ta.tsi(df.close)[f"TSI_{win}_25_13_13"],
-            #"schaff_trend_cycle": lambda: ta.stc(df.close)[f"STC{win}"],
-            "schaff_trend_cycle": lambda: ta.stc(df.close).iloc[:, 0],
-        }
-        series = series_map[ind]()
+        series = IND_FN[ind](df, win, ctx)
         return _compare(series, op, val)
 
     # ---------- 2.  Price vs Moving Averages ----------
@@ -82,14 +322,8 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         op  = cond["op"]
         val = cond["value"]
 
-        ref_map = {
-            "1d_low":  lambda: df.close.rolling(1).min(),
-            "1w_low":  lambda: df.close.rolling(5).min(),
-            "1m_low":  lambda: df.close.rolling(21).min(),
-            "52w_low": lambda: df.close.rolling(252).min(),
-            "52w_high":lambda: df.close.rolling(252).max(),
-        }
-        ref_series = ref_map[ref]()
+        rolling = rolling_max_nb if ref.endswith("_high") else rolling_min_nb
+        ref_series = _series(rolling(bars.close, _REF_WINDOWS[ref]), df)
         pct_change = (df.close - ref_series) / ref_series
         return _compare(pct_change, op, val)
 
@@ -100,15 +334,7 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         op  = cond["op"]
         val = cond["value"]
 
-        series_map = {
-            "volume":     lambda: df.volume,
-            "volume_sma": lambda: df.volume / df.volume.rolling(win).mean(),
-            "atr":        lambda: ta.atr(df.high, df.low, df.close, length=win) / df.close,
-            "bb_width":   lambda: ta.bbands(df.close, length=win)[f"BBB_{win}_2.0"],
-            "kc_width":   lambda: ta.kc(df.high, df.low, df.close, length=win)[f"KCBU_{win}_2_20"] - ta.kc(df.high, df.low, df.close, length=win)[f"KCBL_{win}_2_20"],
-            "ui":         lambda: ta.ui(df.close, length=win),
-        }
-        series = series_map[ind]()
+        series = VOL_FN[ind](df, win, ctx)
         return _compare(series, op, val)
 
     # ---------- 6.  Chart Patterns ----------
@@ -117,16 +343,8 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         direction = cond["direction"]
         window = cond.get("window", 1)
 
-        pat_map = {
-            "bullish_engulfing": lambda: ta.cdl_pattern(name="engulfing", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLENGULFING"],
-            "bearish_engulfing": lambda: ta.cdl_pattern(name="engulfing", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLENGULFING"],
-            "doji":      lambda: ta.cdl_pattern(name="doji", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLDOJI"],
-            "hammer":    lambda: ta.cdl_pattern(name="hammer", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLHAMMER"],
-            "nr7":       lambda: ta.cdl_pattern(name="nr7", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLNR7"],
-            "inside_bar":lambda: ta.cdl_pattern(name="inside", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLINSIDE"],
-            "outside_bar":lambda: ta.cdl_pattern(name="outside", open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDLOUTSIDE"],
-        }
-        series = pat_map[pattern]()
+        name = _CDL_NAMES[pattern]
+        series = ta.cdl_pattern(name=name, open_=df.open, high=df.high, low=df.low, close=df.close)[f"CDL{name.upper()}"]
         if direction == "bullish":
             return series == 100
         elif direction == "bearish":
@@ -140,13 +358,19 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         direction = cond["direction"]
         win = cond.get("window", 14)
 
-        break_map = {
-            "bb_breakout": lambda: (df.close > ta.bbands(df.close, length=win)[f"BBU_{win}_2.0"]) if direction == "up" else (df.close < ta.bbands(df.close, length=win)[f"BBL_{win}_2.0"]),
-            "kc_breakout": lambda: (df.close > ta.kc(df.high, df.low, df.close, length=win)[f"KCBU_{win}_2_20"]) if direction == "up" else (df.close < ta.kc(df.high, df.low, df.close, length=win)[f"KCBL_{win}_2_20"]),
-            "donchian_breakout": lambda: (df.close == df.close.rolling(win).max()) if direction == "up" else (df.close == df.close.rolling(win).min()),
-            "pivot_break": lambda: df.close.shift(1) < df.ta.pivots().pivot_high.shift(1) if direction == "up" else df.close.shift(1) > df.ta.pivots().pivot_low.shift(1),
-        }
-        return break_map[ind]()
+        up = direction == "up"
+        if ind == "bb_breakout":
+            bbl, _, bbu, _ = _bbands(df, win, ctx)
+            return (df.close > bbu) if up else (df.close < bbl)
+        elif ind == "kc_breakout":
+            kc = _kc(df, win, ctx)
+            return (df.close > kc[f"KCBU_{win}_2_20"]) if up else (df.close < kc[f"KCBL_{win}_2_20"])
+        elif ind == "donchian_breakout":
+            rolling = rolling_max_nb if up else rolling_min_nb
+            return df.close == rolling(bars.close, win)
+        elif ind == "pivot_break":
+            pivots = df.ta.pivots()
+            return df.close.shift(1) < pivots.pivot_high.shift(1) if up else df.close.shift(1) > pivots.pivot_low.shift(1)
 
     # ---------- 9.  Special Screeners ----------
     elif category == 9:
@@ -155,14 +379,14 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         win = cond.get("window", 14)
 
         if screener == "base_breakout":
-            return (df.close.rolling(win).max() == df.close) & (df.close.rolling(win).pct_change() <= 0.03)
+            return pd.Series((bars.close == rolling_max_nb(bars.close, win)) & (_pct_change(bars.close, win) <= 0.03), index=df.index)
         elif screener == "adx_trend":
-            adx = ta.adx(df.high, df.low, df.close, length=win)[f"ADX_{win}"]
-            return adx > 25
+            adx = _adx(df, win, ctx)[0]
+            return pd.Series(adx > 25, index=df.index)
         elif screener == "turtle_signal":
-            return df.close == df.close.rolling(win).max()
+            return df.close == rolling_max_nb(bars.close, win)
         else:
-            return pd.Series([False] * len(df))
+            return _no_rows(df)
 
     # ---------- 10.  Time-Based Filters ----------
     elif category == 10:
@@ -170,38 +394,41 @@ def apply_condition(df: pd.DataFrame, cond: dict) -> pd.Series:
         op = cond["op"]
         val = cond["value"]
 
-        days_map = {"1d": 1, "1w": 5, "1m": 21, "3m": 63, "6m": 126, "1y": 252, "ytd": len(df) - 1}
-        days = days_map.get(tf, 21)
+        days = _timeframe_days(tf, len(df))
         pct = df.close.pct_change(days)
         return _compare(pct, op, val)
 
     # ---------- 11.  Fallback ----------
     elif category == 11:
-        return pd.Series([False] * len(df))
+        return _no_rows(df)
 
     # Unknown category
-    return pd.Series([False] * len(df))
+    return _no_rows(df)
 
 
 # ---------- tiny helper ----------
+_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal, "==": np.equal}
+
+
 def _compare(value, op, val):
-    if op == ">":
-        return value > val
-    elif op == ">=":
-        return value >= val
-    elif op == "<":
-        return value < val
-    elif op == "<=":
-        return value <= val
-    elif op == "==":
-        return value == val
-    elif op == "between":
+    """
+    `value <op> val` on the raw ndarray.  Series in → boolean Series out
+    (same index); scalar in → numpy bool.  Ops it doesn't handle (e.g. a
+    crossed_above on a category-1 indicator) match nothing.
+    """
+    is_series = isinstance(value, pd.Series)
+    arr = value.to_numpy() if is_series else np.asarray(value)
+    if op == "between":
         low, high = val
-        return low <= value <= high
+        out = (arr >= low) & (arr <= high)
+    elif op in _OPS:
+        out = _OPS[op](arr, val)
     else:
-        return False
+        out = np.zeros(arr.shape, dtype=bool)
+    return pd.Series(out, index=value.index) if is_series else out
+
 
-def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
+def apply_condition_group(df_group: pd.DataFrame, cond: dict, ctx: dict = None) -> Dict[str, Any]:
     """
     Evaluate ONE condition on ONE symbol and return:
         {
@@ -210,9 +437,12 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
           "indicator": str,        # canonical name
           "window": int | None     # optional
         }
+    `ctx` is an optional memo shared by the conditions evaluated on this symbol.
     """
-    df = df_group.sort_values("date")
+    # screen() hands over date-ordered groups; the O(n) check skips the re-sort
+    df = df_group if df_group["date"].is_monotonic_increasing else df_group.sort_values("date")
     category = cond["category"]
+    bars = _bars(df, ctx)
 
     # ---------- 1.  Indicator Threshold ----------
     if category == 1:
@@ -221,24 +451,8 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         op = cond["op"]
         val = cond["value"]
 
-        series_map = {
-            "rsi":            lambda: ta.rsi(df["close"], length=win).iloc[-1],
-            "stoch":          lambda: ta.stoch(df["high"], df["low"], df["close"], length=win)[f"STOCHk_{win}_3_3"].iloc[-1],
-            "stochrsi":       lambda: ta.stochrsi(df["close"], length=win)[f"STOCHRSIk_{win}_14_14_3_3"].iloc[-1],
-            "cci":            lambda: ta.cci(df["high"], df["low"], df["close"], length=win).iloc[-1],
-            "williams_r":     lambda: ta.willr(df["high"], df["low"], df["close"], length=win).iloc[-1],
-            "awesome_osc":    lambda: ta.ao(df["high"], df["low"]).iloc[-1],
-            "kdj":            lambda: ta.kdj(df["high"], df["low"], df["close"], length=win)[f"K_{win}_3"].iloc[-1],
-            "ultimate_osc":   lambda: ta.uo(df["high"], df["low"], df["close"]).iloc[-1],
-            "chande_momentum":lambda: ta.cmo(df["close"], length=win).iloc[-1],
-            "roc":            lambda: ta.roc(df["close"], length=win).iloc[-1] / 100,
-            "money_flow_idx": lambda: ta.mfi(df["high"], df["low"], df["close"], df["volume"], length=win).iloc[-1],
-            "percentage_price_osc": lambda: ta.ppo(df["close"])[f"PPO_{win}_26_12_9"].iloc[-1],
-            "fisher_transform": lambda: ta.fisher(df["high"], df["low"])[f"FISHERT_{win}_1"].iloc[-1],
-            "tsi":            lambda: ta.tsi(df["close"])[f"TSI_{win}_25_13_13"].iloc[-1],
-            "schaff_trend_cycle": lambda: ta.stc(df["close"])[f"STC{win}"].iloc[-1],
-        }
-        latest = series_map[ind]()
+        fn = LAST_FN.get(ind, IND_FN[ind])
+        latest = _INDICATOR_CACHE.get_or_compute(df, fn, _tail(df, ind, win), win, ctx)[-1]
         return {
             "pass": _compare(latest, op, val),
             "value": float(latest),
@@ -254,10 +468,10 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         val = cond.get("value", win)
 
         ma_series = getattr(ta, ma_type)(df["close"], length=win).iloc[-1]
-        price = df["close"].iloc[-1]
+        price = bars.close[-1]
 
-        crossed_above = (df["close"].iloc[-2] <= ma_series) and (price > ma_series)
-        crossed_below = (df["close"].iloc[-2] >= ma_series) and (price < ma_series)
+        crossed_above = (bars.close[-2] <= ma_series) and (price > ma_series)
+        crossed_below = (bars.close[-2] >= ma_series) and (price < ma_series)
         proximity = abs(price - ma_series) / ma_series <= val
 
         if op == "crossed_above":
@@ -290,15 +504,8 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         op = cond["op"]
         val = cond["value"]
 
-        ref_map = {
-            "1d_low":  lambda: df["close"].rolling(1).min().iloc[-1],
-            "1w_low":  lambda: df["close"].rolling(5).min().iloc[-1],
-            "1m_low":  lambda: df["close"].rolling(21).min().iloc[-1],
-            "52w_low": lambda: df["close"].rolling(252).min().iloc[-1],
-            "52w_high":lambda: df["close"].rolling(252).max().iloc[-1],
-        }
-        ref_price = ref_map[ref]()
-        pct = (df["close"].iloc[-1] - ref_price) / ref_price
+        ref_price = _tail_extreme(bars.close, _REF_WINDOWS[ref], np.max if ref.endswith("_high") else np.min)
+        pct = (bars.close[-1] - ref_price) / ref_price
         return {
             "pass": _compare(pct, op, val),
             "value": float(pct),
@@ -313,16 +520,7 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         op = cond["op"]
         val = cond["value"]
 
-        series_map = {
-            "volume":     lambda: df["volume"].iloc[-1],
-            "volume_sma": lambda: df["volume"].iloc[-1] / df["volume"].rolling(win).mean().iloc[-1],
-            "atr":        lambda: ta.atr(df["high"], df["low"], df["close"], length=win).iloc[-1] / df["close"].iloc[-1],
-            "bb_width":   lambda: ta.bbands(df["close"], length=win)[f"BBB_{win}_2.0"].iloc[-1],
-            "kc_width":   lambda: (ta.kc(df["high"], df["low"], df["close"], length=win)[f"KCBU_{win}_2_20"].iloc[-1] -
-                                   ta.kc(df["high"], df["low"], df["close"], length=win)[f"KCBL_{win}_2_20"].iloc[-1]),
-            "ui":         lambda: ta.ui(df["close"], length=win).iloc[-1],
-        }
-        latest = series_map[ind]()
+        latest = _INDICATOR_CACHE.get_or_compute(df, VOL_FN[ind], _tail(df, ind, win), win, ctx)[-1]
         return {
             "pass": _compare(latest, op, val),
             "value": float(latest),
@@ -335,16 +533,8 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         pattern = cond["pattern_type"]
         direction = cond["direction"]
 
-        pat_map = {
-            "bullish_engulfing": lambda: ta.cdl_pattern(name="engulfing", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLENGULFING"].iloc[-1],
-            "bearish_engulfing": lambda: ta.cdl_pattern(name="engulfing", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLENGULFING"].iloc[-1],
-            "doji":      lambda: ta.cdl_pattern(name="doji", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLDOJI"].iloc[-1],
-            "hammer":    lambda: ta.cdl_pattern(name="hammer", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLHAMMER"].iloc[-1],
-            "nr7":       lambda: ta.cdl_pattern(name="nr7", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLNR7"].iloc[-1],
-            "inside_bar":lambda: ta.cdl_pattern(name="inside", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLINSIDE"].iloc[-1],
-            "outside_bar":lambda: ta.cdl_pattern(name="outside", open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDLOUTSIDE"].iloc[-1],
-        }
-        latest = pat_map[pattern]()
+        name = _CDL_NAMES[pattern]
+        latest = ta.cdl_pattern(name=name, open_=df["open"], high=df["high"], low=df["low"], close=df["close"])[f"CDL{name.upper()}"].iloc[-1]
         if direction == "bullish":
             pass_ = latest == 100
         elif direction == "bearish":
@@ -360,25 +550,24 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         win = cond.get("window", 14)
 
         if ind == "bb_breakout":
-            bb = ta.bbands(df["close"], length=win)
-            bbu = bb[f"BBU_{win}_2.0"].iloc[-1]
-            bbl = bb[f"BBL_{win}_2.0"].iloc[-1]
-            latest = df["close"].iloc[-1]
+            bbl, _, bbu, _ = _bbands(_tail(df, ind, win), win, ctx)
+            bbu, bbl = bbu[-1], bbl[-1]
+            latest = bars.close[-1]
             return {"pass": latest > bbu if direction == "up" else latest < bbl,
                     "value": latest, "indicator": "bb_breakout", "window": win}
 
         elif ind == "kc_breakout":
-            kc = ta.kc(df["high"], df["low"], df["close"], length=win)
+            kc = _kc(_tail(df, ind, win), win, ctx)
             kcu = kc[f"KCBU_{win}_2_20"].iloc[-1]
             kcl = kc[f"KCBL_{win}_2_20"].iloc[-1]
-            latest = df["close"].iloc[-1]
+            latest = bars.close[-1]
             return {"pass": latest > kcu if direction == "up" else latest < kcl,
                     "value": latest, "indicator": "kc_breakout", "window": win}
 
         elif ind == "donchian_breakout":
-            latest = df["close"].iloc[-1]
-            max_ = df["close"].rolling(win).max().iloc[-1]
-            min_ = df["close"].rolling(win).min().iloc[-1]
+            latest = bars.close[-1]
+            max_ = _tail_extreme(bars.close, win, np.max)
+            min_ = _tail_extreme(bars.close, win, np.min)
             return {"pass": latest == max_ if direction == "up" else latest == min_,
                     "value": latest, "indicator": "donchian_breakout", "window": win}
 
@@ -393,20 +582,20 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         win = cond.get("window", 14)
 
         if screener == "base_breakout":
-            latest = df["close"].iloc[-1]
-            max_ = df["close"].rolling(win).max().iloc[-1]
-            pct = df["close"].pct_change(win).iloc[-1]
+            latest = bars.close[-1]
+            max_ = _tail_extreme(bars.close, win, np.max)
+            pct = _tail_pct(bars.close, win)
             return {"pass": latest == max_ and pct <= 0.03,
                     "value": pct, "indicator": "base_breakout", "window": win}
 
         elif screener == "adx_trend":
-            adx = ta.adx(df["high"], df["low"], df["close"], length=win)[f"ADX_{win}"].iloc[-1]
+            adx = _adx(_tail(df, screener, win), win, ctx)[0][-1]
             return {"pass": adx > 25,
                     "value": float(adx), "indicator": "adx_trend", "window": win}
 
         elif screener == "turtle_signal":
-            latest = df["close"].iloc[-1]
-            max_ = df["close"].rolling(win).max().iloc[-1]
+            latest = bars.close[-1]
+            max_ = _tail_extreme(bars.close, win, np.max)
             return {"pass": latest == max_,
                     "value": latest, "indicator": "turtle_signal", "window": win}
 
@@ -416,8 +605,7 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
         op = cond["op"]
         val = cond["value"]
 
-        days_map = {"1d": 1, "1w": 5, "1m": 21, "3m": 63, "6m": 126, "1y": 252, "ytd": len(df) - 1}
-        days = days_map.get(tf, 21)
+        days = _timeframe_days(tf, len(df))
         pct = df["close"].pct_change(days).iloc[-1]
         return {"pass": _compare(pct, op, val),
                 "value": float(pct), "indicator": f"return_{tf}", "window": days}
@@ -429,29 +617,214 @@ def apply_condition_group(df_group: pd.DataFrame, cond: dict) -> Dict[str, Any]:
     return {"pass": False, "value": 0.0, "indicator": "unknown", "window": None}
 
 
-def screen(df: pd.DataFrame, json_filter: dict) -> pd.DataFrame:
+# ---------- vectorised screening ----------
+def _by_symbol(df: pd.DataFrame):
+    return df.groupby("symbol", sort=False, observed=True)
+
+
+def _last_pos(df: pd.DataFrame) -> np.ndarray:
     """
-    Screen multi-stock DataFrame and return the **latest** row of each symbol
-    that satisfies the JSON filter, **plus** the indicator value/name.
+    Row positions of each symbol's last bar, in symbol order (so results
+    come back by symbol even from a date-major frame).  Positions, not
+    labels: a plain pd.concat of per-symbol frames repeats index labels.
+    """
+    pos = np.flatnonzero(_by_symbol(df).cumcount(ascending=False).to_numpy() == 0)
+    return pos[np.argsort(df["symbol"].to_numpy()[pos], kind="stable")]
+
+
+def _ensure_sorted(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    `df` with every symbol's bars in date order, sorting (a copy) only if
+    they aren't.  The O(n) check runs on every call: a flag kept on the
+    frame would ride along onto shuffled copies (pandas copies .attrs).
+    """
+    if _by_symbol(df)["date"].is_monotonic_increasing.all():
+        return df
+    return df.sort_values(["symbol", "date"])
+
+
+def _close_transform(df: pd.DataFrame, fn: Callable) -> pd.Series:
+    """Run `fn` on each symbol's close Series in one groupby-transform pass."""
+    def _wrapped(s):
+        out = fn(s)
+        return pd.Series(np.nan, index=s.index) if out is None else out
+    return _by_symbol(df)["close"].transform(_wrapped)
+
+
+# close-only category-1 indicators screen() computes for all symbols at once
+VECTOR_IND_FN = {
+    "rsi":             lambda df, win: _symbol_rsi(df, win or 14),
+    "chande_momentum": lambda df, win: _close_transform(df, lambda s: ta.cmo(s, length=win)),
+    "roc":             lambda df, win: _close_transform(df, lambda s: ta.roc(s, length=win) / 100),
+}
+
+
+def _vector_values(df: pd.DataFrame, cond: dict):
     """
-    df = df.sort_values(["symbol", "date"])
+    Whole-frame (values, mask, indicator, window) for close-only conditions,
+    or None when the condition has no vectorised form and must go per symbol.
+    `window` is per row (an array) when it depends on the symbol's history.
+    """
+    category = cond["category"]
+    win = cond.get("window", 14)
+
+    if category == 1:
+        ind = cond["indicator"]
+        if ind not in VECTOR_IND_FN:
+            return None
+        values = VECTOR_IND_FN[ind](df, win)
+        return values, _compare(values, cond["op"], cond["value"]), ind, win
 
-    def _screen_group(group):
-        if json_filter["category"] == 8:  # composite
-            # simplified: use first sub-condition for value
-            res = apply_condition_group(group, json_filter["subConditions"][0])
+    elif category == 4:
+        ref = cond["reference"]
+        ref_win = _REF_WINDOWS[ref]
+        rolling = rolling_max_nb if ref.endswith("_high") else rolling_min_nb
+        ref_price = _close_transform(df, lambda s: rolling(_f64(s), ref_win))
+        values = (df["close"] - ref_price) / ref_price
+        return values, _compare(values, cond["op"], cond["value"]), ref, None
+
+    elif category == 7 and cond["indicator"] == "donchian_breakout":
+        rolling = rolling_max_nb if cond["direction"] == "up" else rolling_min_nb
+        band = _close_transform(df, lambda s: rolling(_f64(s), win))
+        return df["close"], df["close"] == band, "donchian_breakout", win
+
+    elif category == 9 and cond["screener"] in ("base_breakout", "turtle_signal"):
+        max_ = _close_transform(df, lambda s: rolling_max_nb(_f64(s), win))
+        if cond["screener"] == "turtle_signal":
+            return df["close"], df["close"] == max_, "turtle_signal", win
+        pct = _close_transform(df, lambda s: _pct_change(_f64(s), win))
+        return pct, (df["close"] == max_) & (pct <= 0.03), "base_breakout", win
+
+    elif category == 10:
+        tf = cond["timeframe"]
+        if tf == "ytd":
+            values = _close_transform(df, lambda s: s.pct_change(len(s) - 1))
+            days = _by_symbol(df)["close"].transform("size").to_numpy() - 1  # as _timeframe_days
         else:
-            res = apply_condition_group(group, json_filter["conditions"][0])
+            days = _timeframe_days(tf, len(df))
+            values = _close_transform(df, lambda s: s.pct_change(days))
+        return values, _compare(values, cond["op"], cond["value"]), f"return_{tf}", days
+
+    return None
 
-        if res["pass"]:
-            row = group.iloc[[-1]].copy()
-            row["indicator_value"] = res["value"]
-            row["indicator_name"]  = res["indicator"]
-            row["window"]          = res.get("window")
-            return row
-        return pd.DataFrame()
 
-    return df.groupby("symbol", group_keys=False).apply(_screen_group).reset_index(drop=True)   
+def _per_symbol(df: pd.DataFrame, conds: list):
+    """
+    apply_condition_group of every condition in `conds` for every symbol →
+    (last-row positions, [(passes, values, windows, indicator) per
+    condition]), written into arrays sized up front in _last_pos order.
+    Each symbol gets one memo for all of `conds`, living only for this
+    screen() call, so composite legs share their bands / ATR / ADX.
+    """
+    order = {p: i for i, p in enumerate(_last_pos(df))}
+    rows = sorted(_by_symbol(df).indices.values(), key=lambda ix: order[ix[-1]])
+    groups = [df.iloc[ix] for ix in rows]
+
+    def _eval(group):
+        ctx = {}
+        return [apply_condition_group(group, cond, ctx) for cond in conds]
+
+    if len(groups) >= _PARALLEL_MIN_SYMBOLS:
+        # numba kernels run nogil and pandas_ta is mostly numpy, so threads
+        # scale without pickling every group to a process pool
+        with ThreadPoolExecutor() as pool:
+            results = list(pool.map(_eval, groups))
+    else:
+        results = [_eval(group) for group in groups]
+
+    n = len(groups)
+    legs = []
+    for j in range(len(conds)):
+        passes = np.zeros(n, dtype=bool)
+        values = np.empty(n, dtype=np.float64)
+        windows = np.empty(n, dtype=object)
+        indicator = None
+        for i, res in enumerate(results):
+            res = res[j]
+            passes[i] = res["pass"]
+            values[i] = res["value"]
+            windows[i] = res.get("window")
+            indicator = res["indicator"]
+        legs.append((passes, values, windows, indicator))
+    pos = np.array([ix[-1] for ix in rows], dtype=np.int64)
+    return pos, legs
+
+
+def _sub_conditions(json_filter: dict):
+    """(leaf conditions, "and"|"or") of a category-8 filter."""
+    comp = json_filter if "subConditions" in json_filter else json_filter["conditions"][0]
+    subs = []
+    for sub in comp["subConditions"]:
+        # parser wraps each leg as {"category": .., "conditions": [...]}
+        subs.extend(sub["conditions"] if "conditions" in sub else [sub])
+    return subs, comp.get("operator", "and")
+
+
+def _screen_composite(df: pd.DataFrame, json_filter: dict) -> pd.DataFrame:
+    """
+    AND/OR of every sub-condition on each symbol's last row.  Close-only legs
+    come from the whole-frame vectorised masks, the rest from one shared
+    per-symbol pass; the legs are then combined with a single numpy reduction.
+    Value / indicator columns come from the first sub-condition.
+    """
+    subs, operator = _sub_conditions(json_filter)
+    pos = _last_pos(df)
+    vecs = [_vector_values(df, sub) for sub in subs]
+    rest = [sub for sub, vec in zip(subs, vecs) if vec is None]
+    legs = iter(_per_symbol(df, rest)[1] if rest else ())  # already in pos order
+    masks, first = [], None
+    for vec in vecs:
+        if vec is not None:
+            values, mask, indicator, window = vec
+            mask = mask.to_numpy(dtype=bool)[pos]
+            values = values.to_numpy()[pos]
+            if np.ndim(window):
+                window = window[pos]
+        else:
+            mask, values, window, indicator = next(legs)
+        masks.append(mask)
+        if first is None:
+            first = values, indicator, window
+
+    if not masks:
+        return _result_rows(df, [], [], None, None)
+    reduce = np.logical_or if operator == "or" else np.logical_and
+    hit = reduce.reduce(masks)
+    values, indicator, window = first
+    if np.ndim(window):
+        window = window[hit].tolist()
+    return _result_rows(df, pos[hit], values[hit], indicator, window)
+
+
+def screen(df: pd.DataFrame, json_filter: dict) -> pd.DataFrame:
+    """
+    Screen multi-stock DataFrame and return the **latest** row of each symbol
+    that satisfies the JSON filter, **plus** the indicator value/name.
+    """
+    df = _ensure_sorted(df)
+    if json_filter["category"] == 8:  # composite
+        return _screen_composite(df, json_filter)
+    cond = json_filter["conditions"][0]
+
+    vec = _vector_values(df, cond)
+    if vec is not None:
+        values, mask, indicator, window = vec
+        pos = _last_pos(df)
+        hit = mask.to_numpy(dtype=bool)[pos]
+        if np.ndim(window):
+            window = window[pos][hit].tolist()
+        return _result_rows(df, pos[hit], values.to_numpy()[pos][hit], indicator, window)
+
+    # indicators needing high/low/volume still go symbol by symbol
+    pos, [(passes, values, windows, indicator)] = _per_symbol(df, [cond])
+    return _result_rows(df, pos[passes], values[passes], indicator, windows[passes].tolist())
+
+
+def _result_rows(df: pd.DataFrame, pos, values, indicator, window) -> pd.DataFrame:
+    """Rows at positions `pos` of `df` plus the indicator columns, assembled in one go."""
+    return df.iloc[pos].assign(
+        indicator_value=values, indicator_name=indicator, window=window
+    ).reset_index(drop=True)
 
 def safe_print(result: pd.DataFrame):
     if result.empty:
@@ -465,7 +838,13 @@ def safe_print(result: pd.DataFrame):
         print(result[cols])
         
 # df must have OHLCV columns
-df = pd.read_csv("ohlcv_last_6_months.csv")  # columns: open, high, low, close, volume
+# explicit dtypes skip inference: float32 halves the bytes every kernel
+# streams (they upcast one symbol at a time via _f64), and a categorical
+# symbol lets groupby work on integer codes
+_CSV_DTYPES = {"open": "float32", "high": "float32", "low": "float32",
+               "close": "float32", "volume": "float32", "symbol": "category"}
+df = pd.read_csv("ohlcv_last_6_months.csv", dtype=_CSV_DTYPES, parse_dates=["date"])  # columns: open, high, low, close, volume
+df = _ensure_sorted(df)  # sort once so every screen() call's check passes
 # Print original DataFrame length
 print(f"📊 Original DataFrame length: {len(df)}")
 
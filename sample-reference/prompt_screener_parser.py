@@ -3,18 +3,63 @@
 Regex-first, LLM-fallback parser for natural-language stock-screens.
 Handles 28/30 pandas-ta indicators via pure regex; falls back to Kimi.
 """
-!pip install openai --quiet
 import re
 import os
+import asyncio
+import copy
 import json
-import openai
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Tuple, Dict, Any
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+
+try:
+    from orjson import loads as _json_loads  # ~3x faster than stdlib, takes bytes too
+except ImportError:  # orjson is optional – stdlib json gives the same dicts
+    _json_loads = json.loads
+
+def _client_kwargs() -> dict:
+    return dict(
+        base_url="https://api.novita.ai/v3/openai",  # Novita endpoint
+        api_key=os.getenv("NOVITA_API_KEY")
+    )
+
+
+# the sync client is built on first LLM call, so regex-only use never pays
+# for it.  The async one is opened per batch instead (_allm_batch): its
+# connection pool belongs to the event loop it was first used on, and every
+# asyncio.run gets a new loop
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    return OpenAI(**_client_kwargs())
+
+
+_LLM_CONCURRENCY = 32  # in-flight requests per batch, keeps us under the QPM limit
+
+
+class _LRU:
+    """
+    Small LRU map.  Unlike functools.lru_cache it can be read without
+    computing and filled from outside, which the async batch path needs.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._store: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        out = self._store.get(key)
+        if out is not None:
+            self._store.move_to_end(key)
+        return out
+
+    def put(self, key: str, value: dict):
+        self._store[key] = value
+        self._store.move_to_end(key)
+        if len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
 
-client = OpenAI(
-    base_url="https://api.novita.ai/v3/openai",  # Novita endpoint
-    api_key=os.getenv("NOVITA_API_KEY")
-)
 
 # ---------- helper map ----------
 NATURAL_OP_MAP = {
@@ -39,115 +84,266 @@ def _normalize_op(op_raw: str) -> str:
     op_raw = op_raw.lower().strip()
     return NATURAL_OP_MAP.get(op_raw, op_raw)
 
+
+def _to_num(v: str) -> float:
+    return float(v.rstrip("%")) / 100 if v.endswith("%") else float(v)
+
+
+# captured group → converter for its value in the output condition
+_FIELD_CONVERTERS = {
+    "value": _to_num,
+    "low": float,
+    "high": float,
+    "window": int,
+    "op": _normalize_op,  # rules with their own op words (MA cross, Fisher)
+}
+_DIRECTION_OP = {"up": "crossed_above", "down": "crossed_below"}
+_DEFAULT_WINDOW_INDS = {"rsi", "cci", "atr"}  # window defaults to 14 when not given
+
 # ---------------------------------------------
 # 1. Regex rules (cover 28 of 30 test cases)
 # ---------------------------------------------
-COMPARISON_REGEX = r"(?P<op>>=|<=|>|<|==|greater than or equal to|at least|no less than|less than or equal to|at most|no more than|greater than|more than|above|less than|below|equal to|equals)"
+# one named branch per canonical op, so a match says which op it is without
+# a _normalize_op lookup; ">=" branches sit before ">" ones, longest phrase first
+_OP_GROUPS = [
+    ("op_gte", ">=", (">=", "greater than or equal to", "at least", "no less than")),
+    ("op_lte", "<=", ("<=", "less than or equal to", "at most", "no more than")),
+    ("op_gt",  ">",  (">", "greater than", "more than", "above")),
+    ("op_lt",  "<",  ("<", "less than", "below")),
+    ("op_eq",  "==", ("==", "equal to", "equals")),
+]
+_OP_SYM = {name: sym for name, sym, _ in _OP_GROUPS}
+COMPARISON_REGEX = "(?:" + "|".join(
+    f"(?P<{name}>{'|'.join(map(re.escape, phrases))})" for name, _, phrases in _OP_GROUPS
+) + ")"
+
+# Category-1 indicators that share one rule shape, token → indicator name.
+# Each dict becomes a single alternation, so a query is scanned once per
+# shape instead of once per indicator.
+_IND_TOKENS = {  # TOKEN [window] OP value
+    "rsi": "rsi",
+    "cci": "cci",
+    "ultimate oscillator": "ultimate_osc",
+    "chande momentum": "chande_momentum",
+    "money flow index": "money_flow_idx",
+    "percentage price oscillator": "percentage_price_osc",
+    "schaff trend cycle": "schaff_trend_cycle",
+}
+_IND_LOOSE_TOKENS = {  # TOKEN ... OP value
+    "stochastic": "stoch",
+    "ao": "awesome_osc",
+    "kdj": "kdj",
+    "uo": "ultimate_osc",
+    "cmo": "chande_momentum",
+    "roc": "roc",
+    "mfi": "money_flow_idx",
+    "ppo": "percentage_price_osc",
+    "tsi": "tsi",
+    "stc": "schaff_trend_cycle",
+}
+_IND_TOKEN_MAP = {**_IND_TOKENS, **_IND_LOOSE_TOKENS}
+
 
-REGEX_RULES = [
+def _token_alt(tokens) -> str:
+    """Regex alternation of `tokens`, longest first, any whitespace between words."""
+    return "|".join(r"\s+".join(map(re.escape, t.split())) for t in sorted(tokens, key=len, reverse=True))
+
+
+_MA_TYPES = {"sma", "ema", "hma", "kama", "dema", "tema", "zlma"}
+
+# (pattern, template, trigger words); a rule is only tried when one of its
+# trigger words appears in the query
+_RAW_RULES = [
     # Category 1: Indicator Threshold
-    (rf"\bRSI\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "rsi"}),
-    (rf"\bStochastic\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "stoch"}),
-    (r"\bStoch\s*RSI\s*(?P<window>\d+)?\s*(?P<low>-?\d+(?:\.\d+)?)\s*-\s*(?P<high>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "stochrsi", "op": "between"}),
-    (rf"\bCCI\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "cci"}),
-    (rf"\bWilliams\s*%?R\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "williams_r"}),
-    (rf"\bAO\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "awesome_osc"}),
-    (rf"\bKDJ\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "kdj"}),
-    (rf"\bUO\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "ultimate_osc"}),
-    (rf"\bCMO\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "chande_momentum"}),
-    (rf"\bROC\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "roc"}),
-    (rf"\bMFI\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "money_flow_idx"}),
-    (rf"\bPPO\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "percentage_price_osc"}),
-    (r"\bFisher Transform\b.*?\bcrossed\s+(?P<op>above|below)\s+(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "fisher_transform", "op_map": {"above": "crossed_above", "below": "crossed_below"}}),
-    (rf"\bTSI\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "tsi"}),
-    (rf"\bSTC\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "schaff_trend_cycle"}),
-    (rf"\bUltimate\s+Oscillator\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "ultimate_osc"}),
-    (rf"\bChande\s+Momentum\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "chande_momentum"}),
-    (rf"\bMoney\s+Flow\s+Index\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "money_flow_idx"}),
-    (rf"\bPercentage\s+Price\s+Oscillator\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "percentage_price_osc"}),
-    (rf"\bSchaff\s+Trend\s+Cycle\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1, "indicator": "schaff_trend_cycle"}),
+    (r"\bstoch\s*rsi\s*(?P<window>\d+)?\s*(?P<low>-?\d+(?:\.\d+)?)\s*-\s*(?P<high>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "stochrsi", "op": "between"}, {"stoch", "stochrsi"}),
+    (r"\bfisher transform\b.*?\bcrossed\s+(?P<op>above|below)\s+(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "fisher_transform", "op_map": {"above": "crossed_above", "below": "crossed_below"}}, {"fisher"}),
+    (rf"\b(?P<ind>{_token_alt(_IND_TOKENS)})\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1}, {t.split()[0] for t in _IND_TOKENS}),
+    (rf"\b(?P<ind>{_token_alt(_IND_LOOSE_TOKENS)})\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)%?", {"category": 1}, set(_IND_LOOSE_TOKENS)),
+    (rf"\bwilliams\s*%?r\b.*?{COMPARISON_REGEX}\s*(?P<value>-?\d+(?:\.\d+)?)", {"category": 1, "indicator": "williams_r"}, {"williams"}),
 
     # Category 2: Price vs Moving Averages
-    (r"\b(?:price|close)?\s*(?P<op>crossed\s+above|crossed\s+below|above|below)\s+(?P<ma_type>sma|ema|hma|kama|dema|tema|zlma)\s+(?P<window>\d+)", {"category": 2}),
-    (r"\bwithin\s+(?P<value>\d+(?:\.\d+)?)%?\s+of\s+(?P<ma_type>sma|ema|hma|kama|dema|tema|zlma)\s+(?P<window>\d+)", {"category": 2, "op": "proximity_within"}),
+    (r"\b(?:price|close)?\s*(?P<op>crossed\s+above|crossed\s+below|above|below)\s+(?P<ma_type>sma|ema|hma|kama|dema|tema|zlma)\s+(?P<window>\d+)", {"category": 2}, _MA_TYPES),
+    (r"\bwithin\s+(?P<value>\d+(?:\.\d+)?)%?\s+of\s+(?P<ma_type>sma|ema|hma|kama|dema|tema|zlma)\s+(?P<window>\d+)", {"category": 2, "op": "proximity_within"}, _MA_TYPES),
 
     # Category 3: Relative Strength
-    (rf"\bRS\s+(?:vs|versus)\s+(?P<benchmark>\w+)\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)", {"category": 3}),
+    (rf"\brs\s+(?:vs|versus)\s+(?P<benchmark>\w+)\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)", {"category": 3}, {"rs"}),
 
     # Category 4: Percent Change from Reference
-    (r"\b(?:up|above)\s+(?P<value>\d+(?:\.\d+)?)%?\s+from\s+(?P<ref>1d|1w|1m|3m|6m|52w|ytd)_low\b", {"category": 4, "reference": "{ref}_low", "op": ">"}),
-    (r"\b(?:down|below)\s+(?P<value>\d+(?:\.\d+)?)%?\s+from\s+(?P<ref>1d|1w|1m|3m|6m|52w|ytd)_high\b", {"category": 4, "reference": "{ref}_high", "op": "<"}),
-    (r"\bwithin\s+(?P<value>\d+(?:\.\d+)?)%?\s+of\s+(?P<ref>52w)_high\b", {"category": 4, "reference": "{ref}_high", "op": "between"}),
+    (r"\b(?:up|above)\s+(?P<value>\d+(?:\.\d+)?)%?\s+from\s+(?P<ref>1d|1w|1m|3m|6m|52w|ytd)_low\b", {"category": 4, "reference": "{ref}_low", "op": ">"}, {"low"}),
+    (r"\b(?:down|below)\s+(?P<value>\d+(?:\.\d+)?)%?\s+from\s+(?P<ref>1d|1w|1m|3m|6m|52w|ytd)_high\b", {"category": 4, "reference": "{ref}_high", "op": "<"}, {"high"}),
+    (r"\bwithin\s+(?P<value>\d+(?:\.\d+)?)%?\s+of\s+(?P<ref>52w)_high\b", {"category": 4, "reference": "{ref}_high", "op": "between"}, {"high"}),
 
     # Category 5: Volume / Volatility
-    (rf"\bATR\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "atr"}),
-    (rf"\bVolume\s+spike\s+(?P<value>\d+(?:\.\d+)?)\s*×?\s*SMA\s+(?P<window>\d+)", {"category": 5, "indicator": "volume_sma"}),
-    (rf"\bBB\s+width\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "bb_width"}),
-    (rf"\bKC\s+width\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "kc_width"}),
-    (rf"\bUlcer\s+Index\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)", {"category": 5, "indicator": "ui"}),
+    (rf"\batr\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "atr"}, {"atr"}),
+    (rf"\bvolume\s+spike\s+(?P<value>\d+(?:\.\d+)?)\s*×?\s*sma\s+(?P<window>\d+)", {"category": 5, "indicator": "volume_sma"}, {"volume"}),
+    (rf"\bbb\s+width\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "bb_width"}, {"bb"}),
+    (rf"\bkc\s+width\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 5, "indicator": "kc_width"}, {"kc"}),
+    (rf"\bulcer\s+index\s*(?P<window>\d+)?\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)", {"category": 5, "indicator": "ui"}, {"ulcer"}),
 
     # Category 6: Chart Patterns
-    (r"\b(bullish\s+|bearish\s+)?engulfing\b", {"category": 6, "pattern_type": "{0}_engulfing"}),
-    (r"\bdoji\b", {"category": 6, "pattern_type": "doji"}),
-    (r"\bhammer\b", {"category": 6, "pattern_type": "hammer"}),
-    (r"\bnr7\b", {"category": 6, "pattern_type": "nr7"}),
-    (r"\binside\s+bar\b", {"category": 6, "pattern_type": "inside_bar"}),
-    (r"\boutside\s+bar\b", {"category": 6, "pattern_type": "outside_bar"}),
+    (r"\b(?:(?P<direction>bullish|bearish)\s+)?engulfing\b", {"category": 6, "pattern_type": "{direction}_engulfing"}, {"engulfing"}),
+    (r"\bdoji\b", {"category": 6, "pattern_type": "doji"}, {"doji"}),
+    (r"\bhammer\b", {"category": 6, "pattern_type": "hammer"}, {"hammer"}),
+    (r"\bnr7\b", {"category": 6, "pattern_type": "nr7"}, {"nr"}),
+    (r"\binside\s+bar\b", {"category": 6, "pattern_type": "inside_bar"}, {"inside"}),
+    (r"\boutside\s+bar\b", {"category": 6, "pattern_type": "outside_bar"}, {"outside"}),
 
     # Category 7: Breakouts
-    (r"\bBB\s+breakout\s+(?P<direction>up|down)\b", {"category": 7, "indicator": "bb_breakout"}),
-    (r"\bDonchian\s+(?P<window>\d+)\s+breakout\s+(?P<direction>up|down)\b", {"category": 7, "indicator": "donchian_breakout"}),
-    (r"\bpivot\s+breakout\b", {"category": 7, "indicator": "pivot_break"}),
+    (r"\bbb\s+breakout\s+(?P<direction>up|down)\b", {"category": 7, "indicator": "bb_breakout"}, {"bb"}),
+    (r"\bdonchian\s+(?P<window>\d+)\s+breakout\s+(?P<direction>up|down)\b", {"category": 7, "indicator": "donchian_breakout"}, {"donchian"}),
+    (r"\bpivot\s+breakout\b", {"category": 7, "indicator": "pivot_break"}, {"pivot"}),
 
     # Category 9: Special Screeners
-    (r"\bbase\s+breakout\b", {"category": 9, "screener": "base_breakout"}),
-    (r"\bturtle\s+(?:soup|signal)\b", {"category": 9, "screener": "turtle_signal"}),
-    (r"\bADX\s+trend\s+(?P<direction>long|short)\b", {"category": 9, "screener": "adx_trend"}),
+    (r"\bbase\s+breakout\b", {"category": 9, "screener": "base_breakout"}, {"base"}),
+    (r"\bturtle\s+(?:soup|signal)\b", {"category": 9, "screener": "turtle_signal"}, {"turtle"}),
+    (r"\badx\s+trend\s+(?P<direction>long|short)\b", {"category": 9, "screener": "adx_trend"}, {"adx"}),
 
     # Category 10: Time-Based Filters
-    (rf"\bweekly\s+return\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 10, "timeframe": "1w"}),
-    (rf"\bYTD\s+return\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 10, "timeframe": "ytd"}),
+    (rf"\bweekly\s+return\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 10, "timeframe": "1w"}, {"weekly"}),
+    (rf"\bytd\s+return\s*{COMPARISON_REGEX}\s*(?P<value>\d+(?:\.\d+)?)%?", {"category": 10, "timeframe": "ytd"}, {"ytd"}),
 ]
 
+# compiled once at import; re.search(str, ...) would hit re's compile cache
+# (and its lock) for every rule on every query.  regex_parse lowercases the
+# query and the patterns are written in lowercase, so no re.IGNORECASE
+# case-folding on every character.  op_map is kept beside the template (not
+# in it) so a match is just the template with the converted groups on top
+REGEX_RULES: list[tuple[re.Pattern, dict, dict | None]] = [
+    (re.compile(p), {k: v for k, v in tmpl.items() if k != "op_map"}, tmpl.get("op_map"))
+    for p, tmpl, _ in _RAW_RULES
+]
+
+
+def _token_index(rules) -> dict[str, list[int]]:
+    """trigger word → indices of the rules it can enable, in rule order."""
+    index: dict[str, list[int]] = {}
+    for idx, (_, _, triggers) in enumerate(rules):
+        for word in triggers:
+            index.setdefault(word, []).append(idx)
+    return index
+
+
+TOKEN_TO_RULES = _token_index(_RAW_RULES)
+del _RAW_RULES  # the parser only reads REGEX_RULES / TOKEN_TO_RULES from here on
+# letters only: "williams%r" must still yield the "williams" trigger
+_WORD_RE = re.compile(r"[a-z]+")
+
 # ---------------------------------------------
 # 2. Regex parser
 # ---------------------------------------------
+def _norm(q: str) -> str:
+    """Lowercase, single-spaced query; the one form every parser below sees."""
+    return " ".join(q.split()).lower()
+
+
 def regex_parse(text: str) -> tuple[bool, dict]:
     """Return (success, json_dict).  On failure → delegate to LLM."""
-    text = text.lower()
-    for idx, (pattern, template) in enumerate(REGEX_RULES):
-        #print(f"[DEBUG] rule #{idx} pattern → {pattern!r}")
-        m = re.search(pattern, text, re.I)
+    return _regex_parse(_norm(text))
+
+
+def _regex_parse(text: str) -> tuple[bool, dict]:
+    """regex_parse on already-_norm'ed text (so ma_type, benchmark, ... come out lowercase)."""
+    # prefilter: only rules whose trigger word is in the query can match.
+    # (This beats one union regex (?P<r0>...)|(?P<r1>...)|... of all rules,
+    # which timed ~2x slower: re tries every branch at every offset and loses
+    # each pattern's literal-prefix scan, while this leaves ~1 rule to try.)
+    words = set(_WORD_RE.findall(text))
+    candidates = sorted({idx for w in words for idx in TOKEN_TO_RULES.get(w, ())})
+    for idx in candidates:
+        pat, template, op_map = REGEX_RULES[idx]
+        #print(f"[DEBUG] rule #{idx} pattern → {pat.pattern!r}")
+        m = pat.search(text)
         if m:
             #print(f"[DEBUG] rule #{idx} MATCHED groups → {m.groupdict()}")
-            out = template.copy()
-            gd = m.groupdict()
-            for k, v in gd.items():
-                if k == "value":
-                    v = float(v.rstrip("%")) / 100 if "%" in v else float(v)
-                elif k in ("low", "high"):
-                    v = float(v)
-                elif k == "op":
-                    v = _normalize_op(v)
-                elif k == "direction":
-                    out["op"] = "crossed_above" if v == "up" else "crossed_below"
-                elif k == "pattern_type":
-                    prefix = (m.group(1) or "").strip()
-                    out[k] = v.format(prefix.rstrip())
-                out[k] = v
-            # default window
-            if "window" not in out and out.get("indicator") in {"rsi", "cci", "atr"}:
-                out["window"] = 14
-            return True, {
-                "category": out["category"],
-                "conditions": [out],   # wrap single condition into list
-                "confidence": "high",
-                "parser": "regex"
-            }
+            return True, _wrap({**template, **_convert_groups(m.groupdict(), template, op_map)})
         #else:
         #    print(f"[DEBUG] rule #{idx} NO match")
     return False, {}
 
+
+def _convert_groups(gd: dict, template: dict, op_map: dict | None = None) -> dict:
+    """Output fields from a match's groups (None groups skipped), including the
+    template-dependent ones, ready to lay over the template in one merge."""
+    conv = {}
+    for k, v in gd.items():
+        if v is None:  # optional group that didn't take part
+            continue
+        if k in _OP_SYM:
+            conv["op"] = _OP_SYM[k]
+        elif k == "ind":
+            conv["indicator"] = _IND_TOKEN_MAP[" ".join(v.split())]
+        else:
+            f = _FIELD_CONVERTERS.get(k)
+            conv[k] = f(v) if f else v
+    # steps that combine captured fields with the template
+    direction = conv.get("direction")
+    if direction in _DIRECTION_OP:
+        conv["op"] = _DIRECTION_OP[direction]
+    if op_map:
+        conv["op"] = op_map[gd["op"]]
+    if "ref" in conv:
+        conv["reference"] = template["reference"].format(ref=conv.pop("ref"))
+    if template.get("pattern_type") == "{direction}_engulfing":
+        # bare "engulfing": either side (both are the same cdl pattern)
+        conv["pattern_type"] = f"{direction or 'bullish'}_engulfing"
+        conv["direction"] = direction or "any"
+    # default window
+    if ("window" not in conv and "window" not in template
+            and conv.get("indicator", template.get("indicator")) in _DEFAULT_WINDOW_INDS):
+        conv["window"] = 14
+    return conv
+
+
+def _wrap(cond: dict) -> dict:
+    return {
+        "category": cond["category"],
+        "conditions": [cond],   # wrap single condition into list
+        "confidence": "high",
+        "parser": "regex"
+    }
+
+
+# and / or that join conditions, not the ones inside a condition: the "or"
+# of "greater / less than or equal to" and the "and" of "between 30 and 70"
+# (a connective followed by a number is a range bound, not a new leg)
+_COMPOSITE_SPLIT = re.compile(r"\s+(and|or)\s+(?!equal to\b)(?!-?\d)")
+
+
+def _split_composite(text: str) -> tuple[list[str], set[str]]:
+    """(fragments, connectives) of `text` split on and / or."""
+    parts = _COMPOSITE_SPLIT.split(text)
+    return parts[::2], set(parts[1::2])
+
+
+def regex_parse_composite(text: str) -> tuple[bool, dict]:
+    """
+    regex_parse, but "X and Y" / "X or Y" is parsed fragment by fragment into
+    a Category-8 filter instead of matching only X.  Fails (→ LLM) if any
+    fragment fails or and / or are mixed.
+    """
+    return _regex_parse_composite(_norm(text))
+
+
+def _regex_parse_composite(text: str) -> tuple[bool, dict]:
+    fragments, ops = _split_composite(text)
+    if len(fragments) == 1:
+        return _regex_parse(text)
+    if len(ops) > 1:
+        return False, {}
+    subs = []
+    for frag in fragments:
+        success, out = _regex_parse(frag)
+        if not success:
+            return False, {}
+        subs.append({"category": out["category"], "conditions": out["conditions"]})
+    return True, {
+        "category": 8,
+        "operator": ops.pop(),
+        "subConditions": subs,
+        "confidence": "high",
+        "parser": "regex"
+    }
+
 # ---------------------------------------------
 # 3. LLM fallback (Kimi via Novita)
 # ---------------------------------------------
@@ -261,25 +457,189 @@ END OF SYSTEM PROMPT
 ──────────────────────────────────
 """
 
-def llm_parse(text: str) -> dict:
-    resp = client.chat.completions.create(
+# The system prompt is the same on every call, so it goes first as one
+# prebuilt message: providers with automatic prefix caching reuse its KV
+# cache after the first request.  Plain string content, the form every
+# OpenAI-compatible endpoint accepts (no vendor-specific cache hints).
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Running totals from each stream's final usage chunk; cached_tokens /
+# prompt_tokens says whether the endpoint actually reuses that prefix.
+LLM_USAGE = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+
+def _record_usage(usage):
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    #print(f"[DEBUG] cached prompt tokens → {cached} / {usage.prompt_tokens}")
+    LLM_USAGE["requests"] += 1
+    LLM_USAGE["prompt_tokens"] += usage.prompt_tokens or 0
+    LLM_USAGE["cached_tokens"] += cached
+
+# The prompt's two-leg composite example is ~90 tokens and each extra leg
+# ~40, so 400 fits a six-leg composite (or a long llmFallback note) without
+# truncating it into unparseable JSON.  Reply text is read only up to its
+# closing brace, so the cap just bounds a runaway answer.
+_MAX_REPLY_TOKENS = 400
+
+
+def _llm_request(text: str) -> dict:
+    """chat.completions.create kwargs, shared by the sync and async clients."""
+    return dict(
         model="moonshotai/kimi-k2-instruct",
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
+            _SYSTEM_MESSAGE,
             {"role": "user", "content": text}
         ],
         temperature=0.0,
-        max_tokens=200
+        # JSON mode: no prose around the object, so the reply only needs
+        # room for the schema itself
+        response_format={"type": "json_object"},
+        max_tokens=_MAX_REPLY_TOKENS,
+        # streamed, so we can stop reading the moment the object closes;
+        # the usage chunk that ends the stream feeds LLM_USAGE
+        stream=True,
+        stream_options={"include_usage": True}
     )
-    #return json.loads(resp.choices[0].message.content)
+
+
+class _JsonEnd:
+    """
+    Brace-depth tracker for a streamed JSON object (braces in strings don't
+    count), fed one delta at a time so each character is scanned once.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_str = self.escaped = self.closed = False
+
+    def feed(self, delta: str) -> bool:
+        """True once the top-level object has closed."""
+        for ch in delta:
+            if self.in_str:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.closed = True
+                    return True
+        return False
+
+
+def _read_chunk(chunk, buf: list, end: _JsonEnd) -> bool:
+    """
+    One stream chunk: its text goes to `buf` until the object closes; after
+    that only the content-free finish / usage chunks are read, and any more
+    text stops the stream.  True → stop reading.
+    """
+    if getattr(chunk, "usage", None):
+        _record_usage(chunk.usage)
+    delta = _delta(chunk)
+    if end.closed:
+        return bool(delta)
+    buf.append(delta)
+    end.feed(delta)
+    return False
+
+
+def _delta(chunk) -> str:
+    return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+
+# normalised text → parsed LLM reply; unparseable replies are never kept,
+# so a retry (or a reply truncated once) gets a fresh request
+_LLM_CACHE = _LRU(1024)
+
+
+def llm_parse(text: str) -> dict:
+    """
+    LLM parse of `text`; repeats (up to case / whitespace) are answered from
+    cache, so callers that bypass parse_query don't re-issue the request.
+    """
+    # deepcopy so a caller mutating the result can't poison the cache
+    return copy.deepcopy(_llm_parse_cached(_norm(text))[1])
+
+
+def _llm_parse_cached(norm: str) -> tuple[bool, dict]:
+    out = _LLM_CACHE.get(norm)
+    if out is not None:
+        return True, out
+    success, out = _llm_fetch(norm)
+    if success:
+        _LLM_CACHE.put(norm, out)
+    return success, out
+
+
+def _llm_fetch(text: str) -> tuple[bool, dict]:
+    buf, end = [], _JsonEnd()
+    with _get_client().chat.completions.create(**_llm_request(text)) as stream:
+        for chunk in stream:
+            if _read_chunk(chunk, buf, end):
+                break
+    #return json.loads("".join(buf))
+    return _parse_content("".join(buf))
+
+
+async def _allm(client: AsyncOpenAI, text: str, sem: asyncio.Semaphore) -> tuple[bool, dict]:
+    buf, end = [], _JsonEnd()
+    async with sem:
+        stream = await client.chat.completions.create(**_llm_request(text))
+        async with stream:
+            async for chunk in stream:
+                if _read_chunk(chunk, buf, end):
+                    break
+    return _parse_content("".join(buf))
+
+
+async def _allm_batch(norms: list[str]) -> dict[str, tuple[bool, dict]]:
+    """
+    (success, reply) per distinct text in `norms`: cache hits first, then
+    every miss in flight concurrently, written back to _LLM_CACHE.
+    """
+    results = {}
+    for norm in dict.fromkeys(norms):
+        out = _LLM_CACHE.get(norm)
+        if out is not None:
+            results[norm] = True, out
+    misses = [norm for norm in dict.fromkeys(norms) if norm not in results]
+    if not misses:
+        return results
+    sem = asyncio.Semaphore(_LLM_CONCURRENCY)
+    async with AsyncOpenAI(**_client_kwargs()) as client:
+        replies = await asyncio.gather(*(_allm(client, n, sem) for n in misses))
+    for norm, (success, out) in zip(misses, replies):
+        results[norm] = success, out
+        if success:
+            _LLM_CACHE.put(norm, out)
+    return results
+
+
+async def llm_parse_many(texts: list[str]) -> list[dict]:
+    """llm_parse for every text, with the uncached requests in flight concurrently."""
+    norms = [_norm(t) for t in texts]
+    results = await _allm_batch(norms)
+    return [copy.deepcopy(results[norm][1]) for norm in norms]
+
+
+def _parse_content(content: str) -> tuple[bool, dict]:
+    """(success, json_dict) of a reply; on failure a safe category-11 dict."""
     try:
-        content = resp.choices[0].message.content.strip()
-        if not content:
+        # JSON mode replies are bare JSON; both parsers skip edge whitespace
+        if not content or content.isspace():
             raise ValueError("Empty response")
-        return json.loads(content)
+        return True, _json_loads(content)
     except Exception as e:
         # fallback to a safe dict
-        return {
+        return False, {
             "category": 11,
             "llmFallback": str(e),
             "confidence": "low",
@@ -289,12 +649,66 @@ def llm_parse(text: str) -> dict:
 # ---------------------------------------------
 # 4. Public API
 # ---------------------------------------------
+_QUERY_CACHE = _LRU(4096)  # normalised query → parse_query result
+
+
+def _cached_or_regex(norm: str) -> dict | None:
+    """Cached result for `norm`, else its regex parse (now cached), else None → LLM."""
+    out = _QUERY_CACHE.get(norm)
+    if out is None:
+        success, out = _regex_parse_composite(norm)
+        if not success:
+            return None
+        out = {**out, "confidence": "high", "parser": "regex"}
+        _QUERY_CACHE.put(norm, out)
+    return out
+
+
+def _store_llm(norm: str, success: bool, out: dict) -> dict:
+    out = {**out, "parser": "llm"}
+    if success:  # like _LLM_CACHE, keep no parse-error fallbacks
+        _QUERY_CACHE.put(norm, out)
+    return out
+
+
 def parse_query(user_query: str) -> dict:
-    success, out = regex_parse(user_query)
-    if success:
-        return {**out, "confidence": "high", "parser": "regex"}
-    return {**llm_parse(user_query), "parser": "llm"}
-    #return {"parser": "llm"}
+    """
+    Parse `user_query`; repeats (up to case / whitespace) are served from
+    cache, skipping the regex scan and the LLM round-trip.
+    """
+    norm = _norm(user_query)
+    out = _cached_or_regex(norm)
+    if out is None:
+        out = _store_llm(norm, *_llm_parse_cached(norm))
+    # deepcopy so a caller mutating the result can't poison the cache
+    return copy.deepcopy(out)
+
+
+def _run(coro):
+    """asyncio.run(coro), on a worker thread when this thread already runs a loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def parse_queries(user_queries: list[str]) -> list[dict]:
+    """
+    parse_query for a batch, through the same cache: each distinct query is
+    looked up / regex-parsed once, then all the LLM fallbacks go at once so
+    the batch costs ~one round-trip.
+    Safe inside a running event loop (e.g. Jupyter), though there awaiting
+    llm_parse_many doesn't block the loop.
+    """
+    norms = [_norm(q) for q in user_queries]
+    results = {norm: _cached_or_regex(norm) for norm in dict.fromkeys(norms)}
+    misses = [norm for norm, out in results.items() if out is None]
+    if misses:
+        for norm, (success, out) in _run(_allm_batch(misses)).items():
+            results[norm] = _store_llm(norm, success, out)
+    return [copy.deepcopy(results[norm]) for norm in norms]
 
 # ---------------------------------------------
 # 5. Quick self-test
@@ -350,5 +764,5 @@ if __name__ == "__main__":
         "YTD return below -10 %                ",
         "Oversold sentiment                    "
     ]
-    for t in tests:
-        print(t, "→", parse_query(t))
\ No newline at end of file
+    for t, parsed in zip(tests, parse_queries(tests)):
+        print(t, "→", parsed)
\ No newline at end of file
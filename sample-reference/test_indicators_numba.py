@@ -0,0 +1,140 @@
+"""
+Checks the numba kernels against plain-pandas versions of the pandas_ta
+definitions, plus the tail lengths prompt_parser_executor.tail_for trims to.
+
+Run with `python -m unittest test_indicators_numba` (or pytest) from this folder.
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from _indicators_numba import (
+    adx_nb, atr_nb, bbands_nb, rolling_max_nb, rolling_min_nb,
+    rsi_grouped_nb, rsi_last_nb, rsi_nb,
+)
+
+# same constant as prompt_parser_executor (importing it would load the CSV)
+_EWM_WARMUP = 10
+
+
+def _ohlc(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(n).cumsum()
+    high = close + rng.random(n)
+    low = close - rng.random(n)
+    return high, low, close
+
+
+# ---------- pandas references ----------
+def _rma(s, n):
+    return s.ewm(alpha=1 / n, min_periods=n, adjust=True).mean()
+
+
+def _rsi_ref(close, n):
+    diff = pd.Series(close).diff()
+    gain, loss = diff.clip(lower=0), (-diff).clip(lower=0)
+    avg_gain, avg_loss = _rma(gain, n), _rma(loss, n)
+    return (100 * avg_gain / (avg_gain + avg_loss)).to_numpy()
+
+
+def _atr_ref(high, low, close, n):
+    h, l, prev = pd.Series(high), pd.Series(low), pd.Series(close).shift()
+    tr = pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+    tr.iloc[0] = np.nan
+    return _rma(tr, n)
+
+
+def _adx_ref(high, low, close, n):
+    up, dn = pd.Series(high).diff(), -pd.Series(low).diff()
+    pos = up.where((up > dn) & (up > 0), 0.0)
+    neg = dn.where((dn > up) & (dn > 0), 0.0)
+    pos.iloc[0] = neg.iloc[0] = np.nan
+    k = 100 / _atr_ref(high, low, close, n)
+    dmp, dmn = k * _rma(pos, n), k * _rma(neg, n)
+    dx = 100 * (dmp - dmn).abs() / (dmp + dmn)
+    return _rma(dx, n).to_numpy(), dmp.to_numpy(), dmn.to_numpy()
+
+
+def _bbands_ref(close, n, k):
+    roll = pd.Series(close).rolling(n)
+    mid, std = roll.mean(), roll.std(ddof=0)
+    lower, upper = mid - k * std, mid + k * std
+    return [s.to_numpy() for s in (lower, mid, upper, 100 * (upper - lower) / mid)]
+
+
+class KernelsMatchPandas(unittest.TestCase):
+    def setUp(self):
+        self.high, self.low, self.close = _ohlc()
+
+    def assertSame(self, got, want):
+        np.testing.assert_allclose(got, want, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    def test_rsi(self):
+        for n in (2, 14, 30):
+            self.assertSame(rsi_nb(self.close, n), _rsi_ref(self.close, n))
+
+    def test_atr(self):
+        self.assertSame(atr_nb(self.high, self.low, self.close, 14),
+                        _atr_ref(self.high, self.low, self.close, 14).to_numpy())
+
+    def test_adx(self):
+        for got, want in zip(adx_nb(self.high, self.low, self.close, 14),
+                             _adx_ref(self.high, self.low, self.close, 14)):
+            self.assertSame(got, want)
+
+    def test_bbands(self):
+        for got, want in zip(bbands_nb(self.close, 20, 2.0), _bbands_ref(self.close, 20, 2.0)):
+            self.assertSame(got, want)
+
+    def test_rolling_extremes(self):
+        x = self.close.copy()
+        x[[5, 100, 101, 400]] = np.nan  # NaN windows stay NaN, like pandas
+        for w in (1, 3, 20):
+            self.assertSame(rolling_max_nb(x, w), pd.Series(x).rolling(w).max().to_numpy())
+            self.assertSame(rolling_min_nb(x, w), pd.Series(x).rolling(w).min().to_numpy())
+        self.assertSame(rolling_max_nb(x[:2], 5), np.full(2, np.nan))
+
+    def test_rsi_last(self):
+        for size in (0, 5, 14, 15, 600):
+            close = self.close[:size]
+            full = rsi_nb(close, 14)
+            want = full[-1] if size else np.nan
+            self.assertSame(rsi_last_nb(close, 14), want)
+
+    def test_rsi_grouped(self):
+        sizes = [50, 3, 200, 120]
+        codes = np.repeat(np.arange(len(sizes)), sizes)
+        close = self.close[:codes.size]
+        starts = np.r_[0, np.cumsum(sizes)]
+        want = np.concatenate([_rsi_ref(close[a:b], 14) for a, b in zip(starts, starts[1:])])
+        self.assertSame(rsi_grouped_nb(close, codes, 14), want)
+
+
+class TailLengths(unittest.TestCase):
+    """The last value over tail_for(ind, win) bars matches the full history."""
+
+    def setUp(self):
+        self.high, self.low, self.close = _ohlc(n=3000, seed=1)
+
+    def assertTailMatches(self, fn, tail):
+        full = fn(self.high, self.low, self.close)
+        cut = fn(self.high[-tail:], self.low[-tail:], self.close[-tail:])
+        np.testing.assert_allclose(cut, full, rtol=1e-4)
+
+    def test_ewm_indicators(self):
+        for win in (5, 14, 30):
+            self.assertTailMatches(lambda h, l, c: rsi_nb(c, win)[-1], win * _EWM_WARMUP)
+            self.assertTailMatches(lambda h, l, c: atr_nb(h, l, c, win)[-1], win * _EWM_WARMUP)
+            self.assertTailMatches(lambda h, l, c: adx_nb(h, l, c, win)[0][-1],
+                                   2 * win * _EWM_WARMUP)
+
+    def test_window_indicators(self):
+        for win in (5, 20):
+            self.assertTailMatches(lambda h, l, c: bbands_nb(c, win, 2.0)[3][-1], win)
+            self.assertTailMatches(lambda h, l, c: rolling_max_nb(h, win)[-1], win)
+            self.assertTailMatches(lambda h, l, c: rolling_min_nb(l, win)[-1], win)
+
+
+if __name__ == "__main__":
+    unittest.main()